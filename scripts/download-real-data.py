@@ -3,9 +3,21 @@ Download real quarterly financial data from Yahoo Finance
 Creates a comprehensive CSV with multiple companies and metrics
 """
 
-import yfinance as yf
 import pandas as pd
 from datetime import datetime
+from yf_pipeline import (
+    cached_statement, fetch_concurrently, extract, new_columns, append_quarters, add_date_columns,
+    to_nullable_int, add_margins, save,
+)
+
+
+def fetch_statements(stock):
+    return (
+        cached_statement(stock, 'quarterly_income_stmt'),
+        cached_statement(stock, 'quarterly_balance_sheet'),
+        cached_statement(stock, 'quarterly_cashflow'),
+    )
+
 
 # S&P500 companies from different sectors
 companies = {
@@ -21,104 +33,85 @@ companies = {
     'PG': 'Procter & Gamble'
 }
 
+# Statement rows extracted per quarter
+INCOME_ROWS = ['Total Revenue', 'Gross Profit', 'Operating Income', 'Net Income', 'EBITDA']
+BALANCE_ROWS = ['Total Assets', 'Total Debt']
+CASHFLOW_ROWS = ['Operating Cash Flow', 'Free Cash Flow']
+
+# Output column -> statement row
+FIELDS = {
+    'Revenue': 'Total Revenue',
+    'Gross_Profit': 'Gross Profit',
+    'EBITDA': 'EBITDA',
+    'Operating_Income': 'Operating Income',
+    'Net_Income': 'Net Income',
+    'Total_Assets': 'Total Assets',
+    'Total_Debt': 'Total Debt',
+    'Operating_Cashflow': 'Operating Cash Flow',
+    'Free_Cashflow': 'Free Cash Flow',
+}
+METRIC_COLUMNS = list(FIELDS)
+MARGINS = [
+    ('Gross_Profit', 'Revenue', 'Gross_Margin'),
+    ('Operating_Income', 'Revenue', 'Operating_Margin'),
+    ('Net_Income', 'Revenue', 'Net_Margin'),
+]
+
 print("📊 Downloading REAL quarterly financial data from Yahoo Finance...")
 print(f"Companies: {len(companies)}")
 print("=" * 80)
 
-all_data = []
+statements = fetch_concurrently(fetch_statements, companies)
+all_data = new_columns(FIELDS)
 
 for ticker, company_name in companies.items():
     print(f"\n📈 Fetching {ticker} - {company_name}...")
 
     try:
-        stock = yf.Ticker(ticker)
-
         # Get quarterly financials
-        quarterly_income = stock.quarterly_income_stmt
-        quarterly_balance = stock.quarterly_balance_sheet
-        quarterly_cashflow = stock.quarterly_cashflow
+        quarterly_income, quarterly_balance, quarterly_cashflow = statements[ticker].result()
 
         if quarterly_income is None or quarterly_income.empty:
             print(f"  ⚠️  No data available for {ticker}")
             continue
 
-        # Process each quarter
-        for col in quarterly_income.columns[:8]:  # Last 8 quarters (~2 years)
-            try:
-                quarter_date = col
-                year = quarter_date.year
-                quarter = f"Q{(quarter_date.month - 1) // 3 + 1}"
-
-                # Extract key metrics (handle missing data gracefully)
-                revenue = quarterly_income.loc['Total Revenue', col] if 'Total Revenue' in quarterly_income.index else None
-                gross_profit = quarterly_income.loc['Gross Profit', col] if 'Gross Profit' in quarterly_income.index else None
-                operating_income = quarterly_income.loc['Operating Income', col] if 'Operating Income' in quarterly_income.index else None
-                net_income = quarterly_income.loc['Net Income', col] if 'Net Income' in quarterly_income.index else None
-
-                # EBITDA calculation (if available)
-                ebitda = None
-                if 'EBITDA' in quarterly_income.index:
-                    ebitda = quarterly_income.loc['EBITDA', col]
-                elif operating_income is not None:
-                    # Approximate EBITDA
-                    ebitda = operating_income
-
-                # Balance sheet metrics
-                total_assets = quarterly_balance.loc['Total Assets', col] if quarterly_balance is not None and 'Total Assets' in quarterly_balance.index else None
-                total_debt = quarterly_balance.loc['Total Debt', col] if quarterly_balance is not None and 'Total Debt' in quarterly_balance.index else None
-
-                # Cash flow metrics
-                operating_cashflow = quarterly_cashflow.loc['Operating Cash Flow', col] if quarterly_cashflow is not None and 'Operating Cash Flow' in quarterly_cashflow.index else None
-                free_cashflow = quarterly_cashflow.loc['Free Cash Flow', col] if quarterly_cashflow is not None and 'Free Cash Flow' in quarterly_cashflow.index else None
-
-                # Calculate margins
-                gross_margin = (gross_profit / revenue) if revenue and gross_profit else None
-                operating_margin = (operating_income / revenue) if revenue and operating_income else None
-                net_margin = (net_income / revenue) if revenue and net_income else None
-
-                row = {
-                    'Company': company_name,
-                    'Ticker': ticker,
-                    'Quarter': quarter,
-                    'Year': year,
-                    'Date': quarter_date.strftime('%Y-%m-%d'),
-                    'Revenue': int(revenue) if pd.notna(revenue) else None,
-                    'Gross_Profit': int(gross_profit) if pd.notna(gross_profit) else None,
-                    'EBITDA': int(ebitda) if pd.notna(ebitda) else None,
-                    'Operating_Income': int(operating_income) if pd.notna(operating_income) else None,
-                    'Net_Income': int(net_income) if pd.notna(net_income) else None,
-                    'Total_Assets': int(total_assets) if pd.notna(total_assets) else None,
-                    'Total_Debt': int(total_debt) if pd.notna(total_debt) else None,
-                    'Operating_Cashflow': int(operating_cashflow) if pd.notna(operating_cashflow) else None,
-                    'Free_Cashflow': int(free_cashflow) if pd.notna(free_cashflow) else None,
-                    'Gross_Margin': float(gross_margin) if pd.notna(gross_margin) else None,
-                    'Operating_Margin': float(operating_margin) if pd.notna(operating_margin) else None,
-                    'Net_Margin': float(net_margin) if pd.notna(net_margin) else None,
-                }
-
-                all_data.append(row)
-                print(f"  ✅ {quarter} {year}: Revenue ${revenue/1e9:.2f}B" if revenue else f"  ⚠️  {quarter} {year}: Missing data")
-
-            except Exception as e:
-                print(f"  ❌ Error processing quarter {col}: {e}")
-                continue
+        # Slice every metric we need once per statement, aligned to the income quarters
+        quarters = quarterly_income.columns[:8]  # Last 8 quarters (~2 years)
+        metrics = pd.concat([
+            extract(quarterly_income, INCOME_ROWS, quarters),
+            extract(quarterly_balance, BALANCE_ROWS, quarters),
+            extract(quarterly_cashflow, CASHFLOW_ROWS, quarters),
+        ], axis=1)
+        if 'EBITDA' not in quarterly_income.index:
+            # Approximate EBITDA with operating income
+            metrics['EBITDA'] = metrics['Operating Income']
+
+        append_quarters(all_data, company_name, ticker, metrics, FIELDS)
+
+        for quarter_date, revenue in metrics['Total Revenue'].items():
+            quarter = f"Q{(quarter_date.month - 1) // 3 + 1}"
+            year = quarter_date.year
+            print(f"  ✅ {quarter} {year}: Revenue ${revenue/1e9:.2f}B" if pd.notna(revenue) else f"  ⚠️  {quarter} {year}: Missing data")
 
     except Exception as e:
         print(f"  ❌ Error fetching {ticker}: {e}")
         continue
 
 print("\n" + "=" * 80)
-print(f"✅ Downloaded {len(all_data)} quarterly records")
+print(f"✅ Downloaded {len(all_data['Company'])} quarterly records")
 
 # Create DataFrame
 df = pd.DataFrame(all_data)
+add_date_columns(df)
+add_margins(df, MARGINS)
+to_nullable_int(df, METRIC_COLUMNS)
 
 # Sort by company and date
 df = df.sort_values(['Company', 'Year', 'Quarter'])
 
 # Save to CSV
 output_path = 'test-data/real-sp500-financials.csv'
-df.to_csv(output_path, index=False)
+save(df, output_path)
 
 print(f"💾 Saved to: {output_path}")
 print(f"\n📊 Dataset Summary:")
@@ -0,0 +1,104 @@
+"""
+Shared helpers for the Yahoo Finance download-*-data.py scripts
+
+Requires: yfinance, pandas, numpy, pyarrow (pip install yfinance pandas pyarrow)
+"""
+
+import os
+import pickle
+import time
+import yfinance as yf
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+from concurrent.futures import ThreadPoolExecutor
+
+
+CACHE_DIR = 'cache'
+CACHE_TTL = 24 * 60 * 60  # Quarterly statements rarely change within a day
+
+# Data is accumulated column-wise so pd.DataFrame() needs no row -> column transpose
+ID_COLUMNS = ['Company', 'Ticker', 'Date']
+
+
+def cached_statement(stock, statement):
+    """Read a statement property (e.g. 'quarterly_income_stmt'), reusing the on-disk copy if fresh"""
+    path = os.path.join(CACHE_DIR, f"{stock.ticker}-{statement}.pkl")
+    if os.path.exists(path) and time.time() - os.path.getmtime(path) < CACHE_TTL:
+        try:
+            with open(path, 'rb') as f:
+                return pickle.load(f)
+        except Exception:
+            pass  # Unreadable (damaged or from another pandas version): refetch and overwrite
+
+    data = getattr(stock, statement)
+    if data is not None and not data.empty:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_path = path + '.tmp'
+        try:
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    return data
+
+
+def fetch_concurrently(fetch, tickers):
+    """Run fetch(stock) for every ticker on a thread pool and return {ticker: Future}"""
+    # yf.Tickers is just a convenience for building the Ticker objects; every Ticker already
+    # goes through yfinance's process-wide session, and statements are still one request per symbol
+    batch = yf.Tickers(' '.join(tickers))
+    # Fetching is network-bound; errors stay on the futures and surface per ticker
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        return {ticker: executor.submit(fetch, batch.tickers[ticker]) for ticker in tickers}
+
+
+def extract(df, rows, columns):
+    """Slice the given rows and quarter columns, returned with one row per quarter (NaN where missing)"""
+    if df is None:
+        df = pd.DataFrame()
+    return df.reindex(index=rows, columns=columns).T
+
+
+def new_columns(fields):
+    """Empty column lists for the identifying columns plus each output field"""
+    return {column: [] for column in ID_COLUMNS + list(fields)}
+
+
+def append_quarters(columns, company, ticker, quarters, fields):
+    """Append one ticker's extracted quarters to the column lists, mapping output column -> statement row"""
+    columns['Company'] += [company] * len(quarters)
+    columns['Ticker'] += [ticker] * len(quarters)
+    columns['Date'] += quarters.index.tolist()  # Raw timestamps, formatted later by add_date_columns()
+    for column, row in fields.items():
+        columns[column] += quarters[row].tolist()
+
+
+def add_date_columns(df):
+    """Derive Quarter and Year from the raw Date timestamps and format Date, all vectorized"""
+    dates = pd.to_datetime(df['Date'])
+    df.insert(df.columns.get_loc('Date'), 'Quarter', 'Q' + dates.dt.quarter.astype(str))
+    df.insert(df.columns.get_loc('Date'), 'Year', dates.dt.year)
+    df['Date'] = dates.dt.strftime('%Y-%m-%d')
+
+
+def to_nullable_int(df, columns):
+    """Cast whole-currency columns to pandas' nullable Int64 (missing values stay empty)"""
+    columns = [c for c in columns if c in df]
+    df[columns] = np.trunc(df[columns].astype(float)).astype('Int64')
+
+
+def add_margins(df, margins):
+    """Add (numerator, denominator, name) ratio columns, NaN where the denominator is 0 or missing"""
+    for numerator, denominator, name in margins:
+        if numerator in df and denominator in df:
+            df[name] = df[numerator] / df[denominator].replace(0, np.nan)
+
+
+def save(df, path):
+    """Write df as CSV with Arrow's native writer (strings and header quoted, nulls as empty fields)"""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    pacsv.write_csv(table, path, write_options=pacsv.WriteOptions(batch_size=16384))